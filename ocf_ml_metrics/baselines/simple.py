@@ -10,9 +10,9 @@ def zero_baseline(predictions: np.ndarray, **kwargs) -> np.ndarray:
         predictions: Prediction array, to match the baseline to
 
     Returns:
-        Array of all 0's
+        Read-only array of all 0's, broadcast to the shape of predictions without a copy
     """
-    return np.zeros_like(predictions)
+    return np.broadcast_to(np.zeros((), dtype=predictions.dtype), predictions.shape)
 
 
 def max_baseline(predictions: np.ndarray, max_capacity: float, **kwargs) -> np.ndarray:
@@ -24,9 +24,9 @@ def max_baseline(predictions: np.ndarray, max_capacity: float, **kwargs) -> np.n
         max_capacity: The max capacity of the system being predicted for
 
     Returns:
-        Array of all max capacity
+        Read-only array of all max capacity, broadcast to the shape of predictions without a copy
     """
-    return np.ones_like(predictions) * max_capacity
+    return np.broadcast_to(max_capacity, predictions.shape)
 
 
 def last_value_persistence(predictions: np.ndarray, last_value: float, **kwargs) -> np.ndarray:
@@ -38,9 +38,9 @@ def last_value_persistence(predictions: np.ndarray, last_value: float, **kwargs)
         last_value: The t0 value for the prediction
 
     Returns:
-        Array of the last t0 value
+        Read-only array of the last t0 value, broadcast to the shape of predictions without a copy
     """
-    return np.ones_like(predictions) * last_value
+    return np.broadcast_to(last_value, predictions.shape)
 
 
 def last_day_persistence(predictions: np.ndarray):
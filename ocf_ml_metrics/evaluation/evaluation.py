@@ -1,12 +1,37 @@
 """ Evaluation the model results """
 
-from typing import Union
+from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
 
 from ocf_ml_metrics.baselines.simple import last_value_persistence, max_baseline, zero_baseline
 from ocf_ml_metrics.evaluation.utils import check_results_df
-from ocf_ml_metrics.metrics.errors import compute_metrics
+from ocf_ml_metrics.metrics.errors import compute_metrics_batch
+from ocf_ml_metrics.metrics.utils import get_day_mask
+
+# Simple baselines to compare every model to
+_BASELINES = [
+    ("zero_baseline", zero_baseline),
+    ("max_baseline", max_baseline),
+    ("last_value_persistence_baseline", last_value_persistence),
+]
+
+
+def _normalize_datetimes(results_df: pd.DataFrame):
+    """
+    Make sure the datetime columns are datetimes, and floor target time to nearest 5-minutes
+
+    The columns are modified in place, and only converted if they are not datetimes already
+
+    Args:
+        results_df: results dataframe
+    """
+    for column in ["t0_datetime_utc", "target_datetime_utc"]:
+        if not is_datetime64_any_dtype(results_df[column]):
+            results_df[column] = pd.to_datetime(results_df[column])
+    results_df["target_datetime_utc"] = results_df["target_datetime_utc"].dt.floor("5min")
 
 
 def evaluation(
@@ -45,9 +70,7 @@ def evaluation(
 
     """
     # make sure datetimes columns datetimes and floor target time t to nearest 5-minutes
-    results_df["t0_datetime_utc"] = pd.to_datetime(results_df["t0_datetime_utc"])
-    results_df["target_datetime_utc"] = pd.to_datetime(results_df["target_datetime_utc"])
-    results_df["target_datetime_utc"] = results_df["target_datetime_utc"].dt.floor("5T")
+    _normalize_datetimes(results_df)
 
     # check result format
     check_results_df(results_df, unit=outturn_unit)
@@ -56,85 +79,58 @@ def evaluation(
     predictions = results_df[f"forecast_pv_outturn_{outturn_unit}"].to_numpy()
     target = results_df[f"actual_pv_outturn_{outturn_unit}"].to_numpy()
     datetimes = results_df["target_datetime_utc"].to_numpy()
+    hour_of_day = results_df["target_datetime_utc"].dt.hour.to_numpy()
+    month_of_year = results_df["target_datetime_utc"].dt.month.to_numpy()
     latitude = results_df["latitude"].to_numpy()
     longitude = results_df["longitude"].to_numpy()
+    start_time = results_df["t0_datetime_utc"].to_numpy()
+    capacity = results_df[f"capacity_{outturn_unit}p"].to_numpy()
+    t0_outturn = results_df[f"t0_actual_pv_outturn_{outturn_unit}"].to_numpy()
 
-    # Calculate metrics on raw outputs
-    metrics = compute_metrics(
-        predictions=predictions,
-        target=target,
+    # Normalized values, shared by the model and all the baselines
+    predictions_norm = predictions / capacity
+    target_norm = target / capacity
+    t0_outturn_norm = t0_outturn / capacity
+    capacity_norm = capacity / capacity
+
+    # Night time only depends on the datetimes and location, so is shared by all metrics
+    day_mask = get_day_mask(
         datetimes=datetimes,
         latitude=latitude,
         longitude=longitude,
         sun_position_for_night=sun_threshold_degrees_for_night,
-        thresholds=error_thresholds,
-        tag=f"{model_name}" + f"/{outturn_unit}",
-        filter_by_night=True,
-        start_time=results_df["t0_datetime_utc"].to_numpy(),
-        **kwargs,
     )
 
-    # Calculate metrics on normalized outputs
-    capacity = results_df[f"capacity_{outturn_unit}p"].to_numpy()
-    metrics.update(
-        compute_metrics(
-            predictions=predictions / capacity,
-            target=target / capacity,
-            datetimes=datetimes,
-            latitude=latitude,
-            longitude=longitude,
-            sun_position_for_night=sun_threshold_degrees_for_night,
-            thresholds=error_thresholds,
-            tag=f"{model_name}" + "/normalized",
-            filter_by_night=True,
-            start_time=results_df["t0_datetime_utc"].to_numpy(),
-            **kwargs,
+    # Calculate metrics for the model and all the simple baselines at once,
+    # on both the raw and normalized outputs
+    raw_predictions = {f"{model_name}" + f"/{outturn_unit}": predictions}
+    normalized_predictions = {f"{model_name}" + "/normalized": predictions_norm}
+    for baseline_name, baseline in _BASELINES:
+        raw_predictions[f"{baseline_name}" + f"/{outturn_unit}"] = baseline(
+            predictions=predictions, max_capacity=capacity, last_value=t0_outturn
         )
-    )
-
-    # Calculate simple metrics baselines
-    t0_outturn = results_df[f"t0_actual_pv_outturn_{outturn_unit}"].to_numpy()
-    for baseline_name, baseline in [
-        ("zero_baseline", zero_baseline),
-        ("max_baseline", max_baseline),
-        ("last_value_persistence_baseline", last_value_persistence),
-    ]:
-        metrics.update(
-            compute_metrics(
-                predictions=baseline(
-                    predictions=predictions, max_capacity=capacity, last_value=t0_outturn
-                ),
-                target=target,
-                datetimes=datetimes,
-                latitude=latitude,
-                longitude=longitude,
-                sun_position_for_night=sun_threshold_degrees_for_night,
-                thresholds=error_thresholds,
-                tag=f"{baseline_name}" + f"/{outturn_unit}",
-                filter_by_night=True,
-                start_time=results_df["t0_datetime_utc"].to_numpy(),
-                **kwargs,
-            )
+        normalized_predictions[f"{baseline_name}" + "/normalized"] = baseline(
+            predictions=predictions_norm,
+            max_capacity=capacity_norm,
+            last_value=t0_outturn_norm,
         )
 
-        # Calculate metrics on normalized outputs
-        capacity = results_df[f"capacity_{outturn_unit}p"].to_numpy()
+    metrics = {}
+    for batch_predictions, batch_target in [
+        (raw_predictions, target),
+        (normalized_predictions, target_norm),
+    ]:
         metrics.update(
-            compute_metrics(
-                predictions=baseline(
-                    predictions=predictions / capacity,
-                    max_capacity=capacity / capacity,
-                    last_value=t0_outturn / capacity,
-                ),
-                target=target / capacity,
+            compute_metrics_batch(
+                predictions=batch_predictions,
+                target=batch_target,
                 datetimes=datetimes,
-                latitude=latitude,
-                longitude=longitude,
-                sun_position_for_night=sun_threshold_degrees_for_night,
+                hour_of_day=hour_of_day,
+                month_of_year=month_of_year,
+                day_mask=day_mask,
                 thresholds=error_thresholds,
-                tag=f"{baseline_name}" + "/normalized",
                 filter_by_night=True,
-                start_time=results_df["t0_datetime_utc"].to_numpy(),
+                start_time=start_time,
                 **kwargs,
             )
         )
@@ -147,6 +143,8 @@ def evaluation(
             sun_threshold_degrees_for_night=sun_threshold_degrees_for_night,
             error_thresholds=error_thresholds,
             outturn_unit=outturn_unit,
+            datetimes_normalized=True,
+            day_mask=day_mask,
             **kwargs,
         )
     )
@@ -166,6 +164,8 @@ def evaluation_per_id(
     sun_threshold_degrees_for_night: float = -5.0,
     error_thresholds: Union[float, int, list] = [1000, 2000],
     outturn_unit: str = "mw",
+    datetimes_normalized: bool = False,
+    day_mask: Optional[np.ndarray] = None,
     **kwargs,
 ) -> dict:
     """
@@ -191,107 +191,87 @@ def evaluation_per_id(
         sun_threshold_degrees_for_night: Sun elevation degrees which signifies 'night'
         error_thresholds: Thresholds, in MW for 'large errors'
         outturn_unit: Str for the units used in the evaluation, usually 'mw', 'kw', or 'w'
+        datetimes_normalized: Whether results_df datetimes have already been converted,
+            floored and checked, i.e. by evaluation, so this can be skipped
+        day_mask: Boolean array which is True for the non-nighttime rows of results_df,
+            if already known. If None it is computed from the rows' datetimes and locations
         kwargs: Arguments for compute_metrics to pass through
             (time_of_year dict, hour_split dict, etc.)
 
     """
-    # make sure datetimes columns datetimes and floor target time t to nearest 5-minutes
-    results_df["t0_datetime_utc"] = pd.to_datetime(results_df["t0_datetime_utc"])
-    results_df["target_datetime_utc"] = pd.to_datetime(results_df["target_datetime_utc"])
-    results_df["target_datetime_utc"] = results_df["target_datetime_utc"].dt.floor("5T")
+    # make sure datetimes columns datetimes and floor target time t to nearest 5-minutes,
+    # unless evaluation has already done this
+    if not datetimes_normalized:
+        _normalize_datetimes(results_df)
 
-    # check result format
-    check_results_df(results_df, unit=outturn_unit)
+        # check result format
+        check_results_df(results_df, unit=outturn_unit)
     metrics = {}
 
+    # Night time only depends on the datetimes and location, so is computed once for all the
+    # rows and shared by all metrics
+    if day_mask is None:
+        day_mask = get_day_mask(
+            datetimes=results_df["target_datetime_utc"].to_numpy(),
+            latitude=results_df["latitude"].to_numpy(),
+            longitude=results_df["longitude"].to_numpy(),
+            sun_position_for_night=sun_threshold_degrees_for_night,
+        )
+
+    # Extract the calendar fields of all the rows in one vectorized call, to slice per ID
+    all_hour_of_day = results_df["target_datetime_utc"].dt.hour.to_numpy()
+    all_month_of_year = results_df["target_datetime_utc"].dt.month.to_numpy()
+
     # Go through it per ID
-    for id in results_df["id"]:
-        per_id_df = results_df.loc[results_df["id"] == id]
+    for id, positions in results_df.groupby("id", sort=False).indices.items():
+        per_id_df = results_df.iloc[positions]
         # Get component parts needed for compute metrics
         predictions = per_id_df[f"forecast_pv_outturn_{outturn_unit}"].to_numpy()
         target = per_id_df[f"actual_pv_outturn_{outturn_unit}"].to_numpy()
         datetimes = per_id_df["target_datetime_utc"].to_numpy()
-        latitude = per_id_df["latitude"].to_numpy()
-        longitude = per_id_df["longitude"].to_numpy()
+        hour_of_day = all_hour_of_day[positions]
+        month_of_year = all_month_of_year[positions]
+        start_time = per_id_df["t0_datetime_utc"].to_numpy()
+        capacity = per_id_df[f"capacity_{outturn_unit}p"].to_numpy()
+        t0_outturn = per_id_df[f"t0_actual_pv_outturn_{outturn_unit}"].to_numpy()
 
-        # Calculate metrics on raw outputs
-        metrics.update(
-            compute_metrics(
-                predictions=predictions,
-                target=target,
-                datetimes=datetimes,
-                latitude=latitude,
-                longitude=longitude,
-                sun_position_for_night=sun_threshold_degrees_for_night,
-                thresholds=error_thresholds,
-                tag=f"{model_name}/" + f"id_{id}" + f"/{outturn_unit}",
-                filter_by_night=True,
-                start_time=per_id_df["t0_datetime_utc"].to_numpy(),
-                **kwargs,
-            )
-        )
+        # Normalized values, shared by the model and all the baselines
+        predictions_norm = predictions / capacity
+        target_norm = target / capacity
+        t0_outturn_norm = t0_outturn / capacity
+        capacity_norm = capacity / capacity
 
-        # Calculate metrics on normalized outputs
-        capacity = per_id_df[f"capacity_{outturn_unit}p"].to_numpy()
-        metrics.update(
-            compute_metrics(
-                predictions=predictions / capacity,
-                target=target / capacity,
-                datetimes=datetimes,
-                latitude=latitude,
-                longitude=longitude,
-                sun_position_for_night=sun_threshold_degrees_for_night,
-                thresholds=error_thresholds,
-                tag=f"{model_name}/" + f"id_{id}" + "/normalized",
-                filter_by_night=True,
-                start_time=per_id_df["t0_datetime_utc"].to_numpy(),
-                **kwargs,
-            )
-        )
+        per_id_day_mask = day_mask[positions]
 
-        # Calculate simple metrics baselines
-        t0_outturn = per_id_df[f"t0_actual_pv_outturn_{outturn_unit}"].to_numpy()
-        for baseline_name, baseline in [
-            ("zero_baseline", zero_baseline),
-            ("max_baseline", max_baseline),
-            ("last_value_persistence_baseline", last_value_persistence),
-        ]:
-            metrics.update(
-                compute_metrics(
-                    predictions=baseline(
-                        predictions=predictions, max_capacity=capacity, last_value=t0_outturn
-                    ),
-                    target=target,
-                    datetimes=datetimes,
-                    latitude=latitude,
-                    longitude=longitude,
-                    sun_position_for_night=sun_threshold_degrees_for_night,
-                    thresholds=error_thresholds,
-                    tag=f"{baseline_name}/" + f"id_{id}" + f"/{outturn_unit}",
-                    filter_by_night=True,
-                    start_time=per_id_df["t0_datetime_utc"].to_numpy(),
-                    **kwargs,
-                )
+        # Calculate metrics for the model and all the simple baselines at once,
+        # on both the raw and normalized outputs
+        raw_predictions = {f"{model_name}/" + f"id_{id}" + f"/{outturn_unit}": predictions}
+        normalized_predictions = {f"{model_name}/" + f"id_{id}" + "/normalized": predictions_norm}
+        for baseline_name, baseline in _BASELINES:
+            raw_predictions[f"{baseline_name}/" + f"id_{id}" + f"/{outturn_unit}"] = baseline(
+                predictions=predictions, max_capacity=capacity, last_value=t0_outturn
+            )
+            normalized_predictions[f"{baseline_name}/" + f"id_{id}" + "/normalized"] = baseline(
+                predictions=predictions_norm,
+                max_capacity=capacity_norm,
+                last_value=t0_outturn_norm,
             )
 
-            # Calculate metrics on normalized outputs
-            capacity = per_id_df[f"capacity_{outturn_unit}p"].to_numpy()
+        for batch_predictions, batch_target in [
+            (raw_predictions, target),
+            (normalized_predictions, target_norm),
+        ]:
             metrics.update(
-                compute_metrics(
-                    predictions=baseline(
-                        predictions=predictions / capacity,
-                        max_capacity=capacity / capacity,
-                        last_value=t0_outturn / capacity,
-                    ),
-                    target=target / capacity,
+                compute_metrics_batch(
+                    predictions=batch_predictions,
+                    target=batch_target,
                     datetimes=datetimes,
-                    latitude=latitude,
-                    longitude=longitude,
-                    sun_position_for_night=sun_threshold_degrees_for_night,
+                    hour_of_day=hour_of_day,
+                    month_of_year=month_of_year,
+                    day_mask=per_id_day_mask,
                     thresholds=error_thresholds,
-                    tag=f"{baseline_name}/" + f"id_{id}" + "/normalized",
                     filter_by_night=True,
-                    start_time=per_id_df["t0_datetime_utc"].to_numpy(),
+                    start_time=start_time,
                     **kwargs,
                 )
             )
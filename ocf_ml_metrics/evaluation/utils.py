@@ -13,12 +13,16 @@ def check_results_df(results_df: pd.DataFrame, unit: str = "mw"):
     """
 
     assert len(results_df) > 0
-    assert "t0_datetime_utc" in results_df.keys()
-    assert "target_datetime_utc" in results_df.keys()
-    assert f"forecast_pv_outturn_{unit}" in results_df.keys()
-    assert f"actual_pv_outturn_{unit}" in results_df.keys()
-    assert f"t0_actual_pv_outturn_{unit}" in results_df.keys()
-    assert "id" in results_df.keys()
-    assert "latitude" in results_df.keys()
-    assert "longitude" in results_df.keys()
-    assert f"capacity_{unit}p" in results_df.keys()
+    required_columns = {
+        "t0_datetime_utc",
+        "target_datetime_utc",
+        f"forecast_pv_outturn_{unit}",
+        f"actual_pv_outturn_{unit}",
+        f"t0_actual_pv_outturn_{unit}",
+        "id",
+        "latitude",
+        "longitude",
+        f"capacity_{unit}p",
+    }
+    missing_columns = required_columns - set(results_df.columns)
+    assert not missing_columns, f"results_df is missing columns: {sorted(missing_columns)}"
@@ -1,10 +1,170 @@
 """Common metrics to compute"""
-from typing import Optional, Union
+import math
+from typing import Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
-from ocf_ml_metrics.metrics.utils import filter_night
+from ocf_ml_metrics.metrics.utils import get_day_mask
+
+_DEFAULT_HOUR_SPLIT = {
+    "Night": (21, 22, 23, 0, 1, 2, 3),
+    "Morning": (4, 5, 6, 7, 8, 9),
+    "Afternoon": (10, 11, 12, 13, 14, 15),
+    "Evening": (16, 17, 18, 19, 20),
+}
+
+_DEFAULT_YEAR_SPLIT = {
+    "Winter": (12, 1, 2),
+    "Spring": (3, 4, 5),
+    "Summer": (6, 7, 8),
+    "Fall": (9, 10, 11),
+}
+
+
+def _as_datetime_index(datetimes: Union[np.ndarray, pd.DatetimeIndex]) -> pd.DatetimeIndex:
+    """
+    Datetimes as a DatetimeIndex, without rebuilding it if it already is one
+
+    Args:
+        datetimes: Array of datetimes, or a DatetimeIndex.
+
+    Returns:
+        DatetimeIndex of the datetimes
+    """
+    if isinstance(datetimes, pd.DatetimeIndex):
+        return datetimes
+    return pd.DatetimeIndex(datetimes)
+
+
+def _hour_of_day(datetimes: Union[np.ndarray, pd.DatetimeIndex]) -> np.ndarray:
+    """
+    Hour of day of each datetime
+
+    datetime64 arrays take a pure integer fast path, without building a DatetimeIndex.
+
+    Args:
+        datetimes: Array of datetimes, or a DatetimeIndex.
+
+    Returns:
+        Hour of each datetime, from 0 to 23, or -1 for NaT
+    """
+    if isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == "M":
+        hours = datetimes.astype("datetime64[h]").view(np.int64) % 24
+        # NaT is the smallest int64, which would otherwise land in a real hour
+        hours[np.isnat(datetimes)] = -1
+        return hours
+    return _as_datetime_index(datetimes).hour.to_numpy()
+
+
+def _month_of_year(datetimes: Union[np.ndarray, pd.DatetimeIndex]) -> np.ndarray:
+    """
+    Month of year of each datetime
+
+    datetime64 arrays take a pure integer fast path, without building a DatetimeIndex.
+
+    Args:
+        datetimes: Array of datetimes, or a DatetimeIndex.
+
+    Returns:
+        Month of each datetime, from 1 to 12, or -1 for NaT
+    """
+    if isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == "M":
+        months = datetimes.astype("datetime64[M]").view(np.int64) % 12 + 1
+        # NaT is the smallest int64, which would otherwise land in a real month
+        months[np.isnat(datetimes)] = -1
+        return months
+    return _as_datetime_index(datetimes).month.to_numpy()
+
+
+def _abs_and_squared_errors(
+    predictions: np.ndarray, target: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Absolute and squared errors from a single subtraction
+
+    The difference is taken once, and its buffer is reused for the absolute errors,
+    so only two arrays are allocated.
+
+    Args:
+        predictions: Prediction array.
+        target: Target array.
+
+    Returns:
+        The absolute errors and the squared errors
+    """
+    diff = np.asarray(np.subtract(predictions, target))
+    squared_error = np.multiply(diff, diff)
+    return np.abs(diff, out=diff), squared_error
+
+
+def _root(mean_squared_error: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    """
+    Square root of a mean squared error
+
+    Double precision scalars, Python floats and np.float64, use math.sqrt, which avoids
+    the much slower ufunc dispatch of np.sqrt. Anything else, like arrays or np.float32
+    scalars, keeps its precision through np.sqrt.
+
+    Args:
+        mean_squared_error: Mean squared error, a scalar or an array.
+
+    Returns:
+        Root mean squared error
+    """
+    # np.float64 subclasses float, but np.float32 doesn't
+    if isinstance(mean_squared_error, float):
+        return math.sqrt(mean_squared_error)
+    return np.sqrt(mean_squared_error)
+
+
+def _sample_mean(values: np.ndarray, square: bool = False) -> Union[float, np.ndarray]:
+    """
+    Mean over the samples, the first axis, of the values or of their squares
+
+    Args:
+        values: Values of each sample.
+        square: Whether to average the squares of the values, in one fused reduction
+            without an array of the squares.
+
+    Returns:
+        Mean over the samples, which keeps any trailing dimensions, and is NaN if there
+        are no samples
+    """
+    # No samples, i.e. all night time once filtered, so skip the empty reductions.
+    # 0-d inputs, a single scalar error, have no length but are never empty
+    if values.ndim > 0 and len(values) == 0:
+        return np.nan if values.ndim == 1 else np.full(values.shape[1:], np.nan)
+
+    # 2+ dimensional input - compute mean but preserve 0th dimension, yields 1-d ndarray.
+    # np.mean over axis 0 takes a slow strided path, so sum the contiguous rows with einsum
+    if values.ndim > 1:
+        if square:
+            return np.einsum("i...,i...->...", values, values) / len(values)
+        return np.einsum("i...->...", values) / len(values)
+    if square:
+        # A single dot product, and ravel views 0-d inputs as one sample
+        flat = values.ravel()
+        return np.dot(flat, flat) / flat.size
+    return np.mean(values)
+
+
+def _mean_errors(abs_error: np.ndarray, squared_error: np.ndarray, tag: str = "") -> dict:
+    """
+    MAE and RMSE from precomputed absolute and squared errors
+
+    Args:
+        abs_error: Absolute errors.
+        squared_error: Squared errors.
+        tag: Tag to add to the dictionary keys, if wanted.
+
+    Returns:
+        Dictionary of MAE and RMSE, which are NaN if there are no errors
+    """
+    return {
+        tag + "mae": _sample_mean(abs_error),
+        tag + "rmse": _root(_sample_mean(squared_error)),
+    }
 
 
 def common_metrics(predictions: np.ndarray, target: np.ndarray, tag: str = "", **kwargs) -> dict:
@@ -14,6 +174,10 @@ def common_metrics(predictions: np.ndarray, target: np.ndarray, tag: str = "", *
     Computes RMSE and MAE. If you'd like to compute the normalized MAE (NMAE), then please
     normalize both the predictions and target before passing them into this function.
 
+    The errors are computed in the precision of the inputs, so float32 predictions and
+    target are reduced in single precision, with half the memory traffic of float64, at
+    the cost of ~7 significant digits in the results.
+
     Args:
         predictions: Predictions for the given time period.
         target: Ground truth to compare against, or output from baseline model.
@@ -23,19 +187,87 @@ def common_metrics(predictions: np.ndarray, target: np.ndarray, tag: str = "", *
     Returns:
         Dictionary of error metrics computed over the given data.
     """
-    error_dict = {}
+    # The sum of squares is one fused reduction over the differences, so unlike the other
+    # metrics no squared error array is needed, and the buffer is reused for the abs errors
+    diff = np.asarray(np.subtract(predictions, target))
+    mean_squared_error = _sample_mean(diff, square=True)
+    abs_error = np.abs(diff, out=diff)
+    return {tag + "mae": _sample_mean(abs_error), tag + "rmse": _root(mean_squared_error)}
 
-    def _mean(input):
-        # 2+ dimensional input - compute mean but preserve 0th dimension, yields 1-d ndarray
-        if len(predictions.shape) > 1:
-            return np.mean(input, axis=0)
-        else:
-            return np.mean(input)
 
-    error_dict[tag + "mae"] = _mean(np.abs(predictions - target))
-    error_dict[tag + "rmse"] = np.sqrt(_mean(np.square(predictions - target)))
+def _split_membership(split: dict[str, tuple[int, ...]]) -> Tuple[tuple[str, ...], np.ndarray]:
+    """
+    Membership matrix of the values in each split
 
-    return error_dict
+    Args:
+        split: Split names, and the values which fall into each split.
+
+    Returns:
+        The split names, and a matrix with a row per split which is 1 in the columns of
+        the split's values and 0 elsewhere
+    """
+    n_values = max((max(members) + 1 for members in split.values() if members), default=0)
+    membership = np.zeros((len(split), n_values))
+    for i, members in enumerate(split.values()):
+        membership[i, list(members)] = 1.0
+    return tuple(split), membership
+
+
+# The default splits never change, so their membership is only built once
+_DEFAULT_HOUR_SPLIT_MEMBERSHIP = _split_membership(_DEFAULT_HOUR_SPLIT)
+_DEFAULT_YEAR_SPLIT_MEMBERSHIP = _split_membership(_DEFAULT_YEAR_SPLIT)
+
+
+def _split_metrics(
+    abs_error: np.ndarray,
+    squared_error: np.ndarray,
+    values: np.ndarray,
+    split_membership: Tuple[tuple[str, ...], np.ndarray],
+    tag: str = "",
+) -> dict:
+    """
+    MAE and RMSE for each split of an integer calendar field, like hour or month
+
+    Args:
+        abs_error: Absolute errors.
+        squared_error: Squared errors.
+        values: Calendar field of each sample, i.e. its hour of day, as integers or
+            floats. Negative or NaN values, like the -1 of NaT here or the NaN pandas
+            gives for NaT, are not in any split.
+        split_membership: Split names, and the membership matrix of the values in each
+            split, from _split_membership.
+        tag: Tag to add before the split names in the dictionary keys, if wanted.
+
+    Returns:
+        Error dictionary with the split names as tags. Empty splits are skipped.
+    """
+    names, membership = split_membership
+    n_values = membership.shape[1]
+
+    # Drop the samples outside every split up front, as bincount rejects negative values.
+    # NaN fails both comparisons, so it is dropped too
+    values = np.asarray(values)
+    in_range = (values >= 0) & (values < n_values)
+    if not in_range.all():
+        values = values[in_range]
+        abs_error = abs_error[in_range]
+        squared_error = squared_error[in_range]
+    # bincount only takes integer indices
+    values = values.astype(np.intp, copy=False)
+
+    # One pass over the data sums the errors of every calendar value, then each split
+    # adds up the sums of its values
+    counts, sum_abs, sum_sq = _grouped_sums(values, abs_error, squared_error, n_values)
+    split_counts = membership @ counts
+    split_sum_abs = np.tensordot(membership, sum_abs, axes=1)
+    split_sum_sq = np.tensordot(membership, sum_sq, axes=1)
+
+    metrics = {}
+    for i, name in enumerate(names):
+        if split_counts[i] > 0:
+            metrics[tag + name + "/mae"] = split_sum_abs[i] / split_counts[i]
+            metrics[tag + name + "/rmse"] = _root(split_sum_sq[i] / split_counts[i])
+    return metrics
 
 
 def compute_metrics_part_of_day(
@@ -43,6 +275,7 @@ def compute_metrics_part_of_day(
     target: np.ndarray,
     datetimes: np.ndarray,
     hour_split: Optional[dict[str, tuple[int, ...]]] = None,
+    hour_of_day: Optional[np.ndarray] = None,
     **kwargs,
 ) -> dict:
     """
@@ -53,29 +286,25 @@ def compute_metrics_part_of_day(
         target: Target array.
         datetimes: Array of datetimes.
         hour_split: Hour split. If None then a sensible default will be used.
+        hour_of_day: Hour of each datetime, if already known. If None it is
+            extracted from datetimes.
         kwargs: Not used.
 
     Returns:
         Error dictionary based on the part of day.
     """
     if hour_split is None:
-        hour_split = {
-            "Night": (21, 22, 23, 0, 1, 2, 3),
-            "Morning": (4, 5, 6, 7, 8, 9),
-            "Afternoon": (10, 11, 12, 13, 14, 15),
-            "Evening": (16, 17, 18, 19, 20),
-        }
+        hour_split_membership = _DEFAULT_HOUR_SPLIT_MEMBERSHIP
+    else:
+        hour_split_membership = _split_membership(hour_split)
 
-    metrics = {}
-    for split, hours in hour_split.items():
-        split_dates = np.asarray(
-            [i for i, d in enumerate(datetimes) if pd.Timestamp(d).hour in hours]
-        )
-        if len(split_dates) > 0:
-            metrics.update(
-                common_metrics(predictions[split_dates], target[split_dates], tag=split + "/")
-            )
-    return metrics
+    # Extract the hour of every datetime in one vectorized call
+    if hour_of_day is None:
+        hour_of_day = _hour_of_day(datetimes)
+
+    return _split_metrics(
+        *_abs_and_squared_errors(predictions, target), hour_of_day, hour_split_membership
+    )
 
 
 def compute_metrics_part_of_year(
@@ -83,6 +312,7 @@ def compute_metrics_part_of_year(
     target: np.ndarray,
     datetimes: np.ndarray,
     year_split: Optional[dict[str, tuple[int, ...]]] = None,
+    month_of_year: Optional[np.ndarray] = None,
     **kwargs,
 ) -> dict:
     """
@@ -93,29 +323,145 @@ def compute_metrics_part_of_year(
         target: Target array.
         datetimes: Datetimes of targets/predictions.
         year_split: How to split the year. If None then a sensible default will be used.
+        month_of_year: Month of each datetime, if already known. If None it is
+            extracted from datetimes.
         kwargs: Not used.
 
     Returns:
         Error based on the different times of year.
     """
     if year_split is None:
-        year_split = {
-            "Winter": (12, 1, 2),
-            "Spring": (3, 4, 5),
-            "Summer": (6, 7, 8),
-            "Fall": (9, 10, 11),
-        }
+        year_split_membership = _DEFAULT_YEAR_SPLIT_MEMBERSHIP
+    else:
+        year_split_membership = _split_membership(year_split)
 
-    metrics = {}
-    for split, months in year_split.items():
-        split_dates = np.asarray(
-            [i for i, d in enumerate(datetimes) if pd.Timestamp(d).month in months]
-        )
-        if len(split_dates) > 0:
-            metrics.update(
-                common_metrics(predictions[split_dates], target[split_dates], tag=split + "/")
-            )
-    return metrics
+    # Extract the month of every datetime in one vectorized call
+    if month_of_year is None:
+        month_of_year = _month_of_year(datetimes)
+
+    return _split_metrics(
+        *_abs_and_squared_errors(predictions, target), month_of_year, year_split_membership
+    )
+
+
+def _grouped_sums(
+    group_index: np.ndarray, abs_error: np.ndarray, squared_error: np.ndarray, n_groups: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sum the errors of every group in a single pass over the data
+
+    Args:
+        group_index: Group of each sample, non-negative integers.
+        abs_error: Absolute error of each sample.
+        squared_error: Squared error of each sample.
+        n_groups: Minimum number of groups, more are returned if group_index is larger.
+
+    Returns:
+        Count, sum of absolute errors, and sum of squared errors of each group. The sums
+        keep any trailing dimensions of the errors.
+    """
+    counts = np.bincount(group_index, minlength=n_groups)
+    if abs_error.ndim == 1:
+        sum_abs = np.bincount(group_index, weights=abs_error, minlength=n_groups)
+        sum_sq = np.bincount(group_index, weights=squared_error, minlength=n_groups)
+    else:
+        sum_abs = np.zeros((len(counts),) + abs_error.shape[1:])
+        sum_sq = np.zeros_like(sum_abs)
+        np.add.at(sum_abs, group_index, abs_error)
+        np.add.at(sum_sq, group_index, squared_error)
+    return counts, sum_abs, sum_sq
+
+
+def _grouped_errors(
+    group_index: np.ndarray, abs_error: np.ndarray, squared_error: np.ndarray, n_groups: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce the errors of every group in a single pass over the data
+
+    Args:
+        group_index: Group of each sample, in the range [0, n_groups).
+        abs_error: Absolute error of each sample.
+        squared_error: Squared error of each sample.
+        n_groups: Number of groups.
+
+    Returns:
+        Count, MAE and RMSE of each group. MAE and RMSE keep any trailing dimensions
+        of the errors, and are NaN for empty groups.
+    """
+    counts, sum_abs, sum_sq = _grouped_sums(group_index, abs_error, squared_error, n_groups)
+    group_counts = counts.reshape((n_groups,) + (1,) * (abs_error.ndim - 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = sum_abs / group_counts
+        rmse = np.sqrt(sum_sq / group_counts)
+    return counts, mae, rmse
+
+
+def _horizon_minutes(
+    datetimes: Union[np.ndarray, pd.DatetimeIndex], start_time: np.ndarray
+) -> np.ndarray:
+    """
+    Forecast horizon of every sample in whole minutes, in one vectorized subtraction
+
+    Args:
+        datetimes: Datetimes of targets/predictions, or a DatetimeIndex.
+        start_time: Datetimes of start time, or a DatetimeIndex.
+
+    Returns:
+        timedelta64[m] array of forecast horizons, NaT where either datetime is NaT
+    """
+    # datetime64 arrays subtract in numpy, anything else, like a DatetimeIndex or timezone
+    # aware datetimes, goes through a single pandas subtraction to a TimedeltaIndex. Both
+    # sides are converted, as pandas subtracts an object array element by element
+    if not (isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == "M"):
+        datetimes = _as_datetime_index(datetimes)
+    if np.ndim(start_time) > 0 and not (
+        isinstance(start_time, np.ndarray) and start_time.dtype.kind == "M"
+    ):
+        start_time = _as_datetime_index(start_time)
+    deltas = np.asarray(datetimes - start_time, dtype="timedelta64[ns]")
+    return deltas.astype("timedelta64[m]")
+
+
+def _horizon_metrics(
+    abs_error: np.ndarray, squared_error: np.ndarray, horizon_minutes: np.ndarray, tag: str = ""
+) -> dict:
+    """
+    MAE and RMSE for each forecast horizon
+
+    Args:
+        abs_error: Absolute errors.
+        squared_error: Squared errors.
+        horizon_minutes: Forecast horizon of each sample, from _horizon_minutes. Samples
+            with a NaT horizon are dropped.
+        tag: Tag to add to the dictionary keys, if wanted.
+
+    Returns:
+        Error dictionary with one MAE and RMSE per forecast horizon
+    """
+    # NaT would otherwise be grouped as the smallest int64 horizon, so drop those samples,
+    # as the part of day and year splits do
+    is_nat = np.isnat(horizon_minutes)
+    if is_nat.any():
+        horizon_minutes = horizon_minutes[~is_nat]
+        abs_error = abs_error[~is_nat]
+        squared_error = squared_error[~is_nat]
+
+    # Group the samples by forecast horizon. Every element of a sample shares its
+    # horizon, so any trailing dimensions are averaged over
+    horizons, horizon_index = np.unique(horizon_minutes.astype(np.int64), return_inverse=True)
+    elements_per_sample = int(np.prod(abs_error.shape[1:]))
+    if elements_per_sample > 1:
+        horizon_index = np.repeat(horizon_index, elements_per_sample)
+    _, mae, rmse = _grouped_errors(
+        horizon_index, abs_error.ravel(), squared_error.ravel(), n_groups=len(horizons)
+    )
+
+    # Build all the entries in one comprehension, formatting the horizons as Python ints
+    return {
+        f"{tag}forecast_horizon_{horizon}_minutes/{metric}": value
+        for horizon, horizon_mae, horizon_rmse in zip(horizons.tolist(), mae, rmse, strict=True)
+        for metric, value in (("mae", horizon_mae), ("rmse", horizon_rmse))
+    }
 
 
 def compute_metrics_time_horizons(
@@ -138,24 +484,49 @@ def compute_metrics_time_horizons(
     Returns:
         Error based on the different time horizons.
     """
-    metrics = {}
-    for i in range(len(datetimes)):
-        time_delta: pd.Timedelta = pd.Timestamp(datetimes[i]) - pd.Timestamp(start_time[i])
-        metrics.update(
-            common_metrics(
-                predictions[i],
-                target[i],
-                tag=f"forecast_horizon_{time_delta.seconds // 60}_minutes/",
+    return _horizon_metrics(
+        *_abs_and_squared_errors(predictions, target), _horizon_minutes(datetimes, start_time)
+    )
+
+
+def _large_error_counts(
+    abs_error: np.ndarray, thresholds: list, sigma: float = -1.0, tag: str = ""
+) -> dict:
+    """
+    Count the absolute errors above each threshold
+
+    Args:
+        abs_error: Absolute errors.
+        thresholds: Thresholds in absolute value. Negative thresholds are not counted.
+        sigma: Sigma level, only used in the keys of negative thresholds.
+        tag: Tag to add to the dictionary keys, if wanted.
+
+    Returns:
+        Error dictionary with the counts of the large errors.
+    """
+    # Compare the errors against each threshold, reusing one boolean buffer
+    errors = abs_error.ravel()
+    large_error_mask = np.empty(errors.shape, dtype=bool)
+
+    error_dict = {}
+    for thresh in thresholds:
+        if thresh >= 0:
+            np.greater(errors, thresh, out=large_error_mask)
+            error_dict[f"{tag}large_error_count_threshold_{thresh}"] = int(
+                np.count_nonzero(large_error_mask)
             )
-        )
-    return metrics
+        else:
+            error_dict[f"{tag}large_error_count_sigma_{sigma}"] = 0
+
+    return error_dict
 
 
 def count_large_errors(
     predictions: np.ndarray,
     target: np.ndarray,
-    threshold: float = -1.0,
+    threshold: Union[list, float] = -1.0,
     sigma: float = -1.0,
+    tag: str = "",
     **kwargs,
 ) -> dict:
     """
@@ -164,149 +535,274 @@ def count_large_errors(
     Args:
         predictions: Prediction array.
         target: Target array.
-        threshold: Threshold in absolute value, if >= 0,
-            only one of threshold or sigma can be set.
+        threshold: Threshold in absolute value, if >= 0, or a list of thresholds
+            which are all counted in one pass. Only one of threshold or sigma can be set.
         sigma: Sigma level for which counts as a large error, if >= 0
             only one of threshold or sigma can be set.
-        **kwargs: Only the 'tag' key is used. 'tag' is optional.
+        tag: Tag to add to the dictionary keys, if wanted.
+        kwargs: Not used.
 
     Returns:
         Error dictionary with the counts of the large errors.
     """
-    if threshold >= 0:
+    thresholds = threshold if isinstance(threshold, list) else [threshold]
+    if any(thresh >= 0 for thresh in thresholds):
         assert sigma < 0, ValueError("Cannot set both sigma and threshold")
     elif sigma >= 0:
-        assert threshold < 0, ValueError("Cannot set both sigma and threshold")
         raise NotImplementedError("Sigma support isn't created yet")
 
-    # Need error by forecast horizon
-    errors = np.abs(predictions - target)
-    large_error_count = 0
-    for err in errors:
-        if threshold >= 0:
-            if err > threshold:
-                large_error_count += 1
-
-    error_dict = {
-        kwargs.get("tag", "")
-        + "large_error_count_"
-        + f"{'threshold' if threshold >= 0 else 'sigma'}_"
-        + f"{threshold if threshold >= 0 else sigma}": large_error_count
-    }
+    # Only the absolute errors are needed, so take them in place in the difference buffer
+    diff = np.asarray(np.subtract(predictions, target))
+    abs_error = np.abs(diff, out=diff)
+    return _large_error_counts(abs_error, thresholds, sigma=sigma, tag=tag)
+
+
+def _all_metrics(
+    abs_error: np.ndarray,
+    squared_error: np.ndarray,
+    hour_of_day: np.ndarray,
+    month_of_year: np.ndarray,
+    horizon_minutes: np.ndarray,
+    thresholds: list,
+    hour_split_membership: Tuple[tuple[str, ...], np.ndarray] = _DEFAULT_HOUR_SPLIT_MEMBERSHIP,
+    year_split_membership: Tuple[tuple[str, ...], np.ndarray] = _DEFAULT_YEAR_SPLIT_MEMBERSHIP,
+    tag: str = "",
+) -> dict:
+    """
+    All the metrics of compute_metrics, from precomputed errors and calendar fields
 
-    return error_dict
+    Args:
+        abs_error: Absolute errors.
+        squared_error: Squared errors.
+        hour_of_day: Hour of day of each sample.
+        month_of_year: Month of year of each sample.
+        horizon_minutes: Forecast horizon of each sample, from _horizon_minutes.
+        thresholds: Thresholds for computing large errors.
+        hour_split_membership: Membership of the hour split, from _split_membership.
+        year_split_membership: Membership of the year split, from _split_membership.
+        tag: Tag to add to the dictionary keys, so they are built in their final form.
 
+    Returns:
+        Dictionary of metrics
+    """
+    metrics = _mean_errors(abs_error, squared_error, tag=tag)
+    metrics.update(
+        _split_metrics(
+            abs_error,
+            squared_error,
+            hour_of_day,
+            hour_split_membership,
+            tag=tag,
+        )
+    )
+    metrics.update(
+        _split_metrics(
+            abs_error,
+            squared_error,
+            month_of_year,
+            year_split_membership,
+            tag=tag,
+        )
+    )
+    metrics.update(_horizon_metrics(abs_error, squared_error, horizon_minutes, tag=tag))
+    if len(thresholds) > 0:
+        metrics.update(_large_error_counts(abs_error, thresholds, tag=tag))
+    return metrics
 
-def compute_metrics(
-    predictions: np.ndarray,
+
+def compute_metrics_batch(
+    predictions: dict[str, np.ndarray],
     target: np.ndarray,
     datetimes: np.ndarray,
     start_time: np.ndarray,
     filter_by_night: bool = False,
-    tag: str = "",
     thresholds: Union[list, float] = -1,
+    hour_of_day: Optional[np.ndarray] = None,
+    month_of_year: Optional[np.ndarray] = None,
+    day_mask: Optional[np.ndarray] = None,
+    hour_split: Optional[dict[str, tuple[int, ...]]] = None,
+    year_split: Optional[dict[str, tuple[int, ...]]] = None,
+    latitude: Optional[Union[float, np.ndarray]] = None,
+    longitude: Optional[Union[float, np.ndarray]] = None,
+    sun_position_for_night: float = -5,
     **kwargs,
 ) -> dict:
     """
-    Convenience function to compute all metrics.
+    Compute all metrics for several predictions of the same target at once.
+
+    Everything which only depends on the datetimes (hour and month extraction, forecast
+    horizons, and the night filter) is computed once and shared by all the predictions,
+    and the errors of all the predictions are computed in one stacked subtraction.
+    As in common_metrics, the errors keep the precision of the inputs, so passing float32
+    arrays halves the size of the error buffers.
 
     Args:
-        predictions: Prediction array.
+        predictions: Prediction arrays, all the same shape as target, keyed by the tag to
+            use for each one, e.g. a model and the baselines to compare it to.
         target: Target array.
         datetimes: Datetimes for the array.
         start_time: Array where predictions begin from,
             where the forecast time horizon is measured from.
-        tag: Tag to use for overall (i.e. train/val/test).
         filter_by_night: Filter by night time as well and return metrics for only daytime,
-            requires 'latitude'm 'longitude', and 'sun_position_for_night' kwargs.
+            requires latitude, longitude, and sun_position_for_night, unless day_mask is given.
         thresholds: Thresholds for computing large errors (i.e. what defines large)
             can be list of thresholds, or a single one. None are calculated by default.
-        **kwargs: Kwargs for other options, like hour split, or year split.
+        hour_of_day: Hour of each datetime, if already known, so repeated calls on the
+            same datetimes don't extract it again. If None it is extracted from datetimes.
+        month_of_year: Month of each datetime, if already known. If None it is
+            extracted from datetimes.
+        day_mask: Boolean array which is True for non-nighttime samples, if already known,
+            i.e. from get_day_mask. If None and filter_by_night is set, it is computed from
+            latitude, longitude, and sun_position_for_night.
+        hour_split: Hour split. If None then a sensible default will be used.
+        year_split: How to split the year. If None then a sensible default will be used.
+        latitude: Latitude of the site(s), for the night filter.
+        longitude: Longitude of the site(s), for the night filter.
+        sun_position_for_night: Sun elevation in degrees below which it is 'night'.
+        kwargs: Not used.
 
     Returns:
-        Dictionary of metrics
+        Dictionary of metrics for all the predictions, prefixed by their tags
     """
-    assert len(predictions) == len(target) == len(datetimes) == len(start_time), ValueError(
-        "Lens of prediction, target, datetime, and start times "
-    )
-    metrics = common_metrics(predictions=predictions, target=target)
-    metrics.update(
-        compute_metrics_part_of_day(
-            predictions=predictions, target=target, datetimes=datetimes, **kwargs
-        )
-    )
-    metrics.update(
-        compute_metrics_part_of_year(
-            predictions=predictions, target=target, datetimes=datetimes, **kwargs
+    for prediction in predictions.values():
+        assert len(prediction) == len(target) == len(datetimes) == len(start_time), ValueError(
+            "Lens of prediction, target, datetime, and start times "
         )
+    hour_split_membership = (
+        _DEFAULT_HOUR_SPLIT_MEMBERSHIP if hour_split is None else _split_membership(hour_split)
     )
-    metrics.update(
-        compute_metrics_time_horizons(
-            predictions=predictions,
-            target=target,
-            datetimes=datetimes,
-            start_time=start_time,
-            **kwargs,
-        )
+    year_split_membership = (
+        _DEFAULT_YEAR_SPLIT_MEMBERSHIP if year_split is None else _split_membership(year_split)
     )
-    if isinstance(thresholds, list):
-        for thresh in thresholds:
-            metrics.update(
-                count_large_errors(predictions=predictions, target=target, threshold=thresh)
-            )
-    elif thresholds >= 0:
-        metrics.update(
-            count_large_errors(predictions=predictions, target=target, threshold=thresholds)
-        )
-
-    # Filter by night and run again
+    if not isinstance(thresholds, list):
+        thresholds = [thresholds] if thresholds >= 0 else []
+
+    # Compute the calendar fields and forecast horizons once, for all the predictions
+    if hour_of_day is None:
+        hour_of_day = _hour_of_day(datetimes)
+    if month_of_year is None:
+        month_of_year = _month_of_year(datetimes)
+    horizon_minutes = _horizon_minutes(datetimes, start_time)
     if filter_by_night:
-        day_predictions, day_target, day_datetime = filter_night(
-            predictions=predictions,
-            target=target,
-            datetimes=datetimes,
-            latitude=kwargs.get("latitude"),
-            longitude=kwargs.get("longitude"),
-            sun_position_for_night=kwargs.get("sun_position_for_night", -5),
-        )
-        day_metrics = common_metrics(predictions=day_predictions, target=day_target)
-        day_metrics.update(
-            compute_metrics_part_of_day(
-                predictions=day_predictions, target=day_target, datetimes=day_datetime, **kwargs
+        if day_mask is None:
+            day_mask = get_day_mask(
+                datetimes=datetimes,
+                latitude=latitude,
+                longitude=longitude,
+                sun_position_for_night=sun_position_for_night,
             )
-        )
-        day_metrics.update(
-            compute_metrics_part_of_year(
-                predictions=day_predictions, target=day_target, datetimes=day_datetime, **kwargs
-            )
-        )
-        day_metrics.update(
-            compute_metrics_time_horizons(
-                predictions=day_predictions,
-                target=day_target,
-                datetimes=day_datetime,
-                start_time=start_time,
-                **kwargs,
+        day_hour_of_day = hour_of_day[day_mask]
+        day_month_of_year = month_of_year[day_mask]
+        day_horizon_minutes = horizon_minutes[day_mask]
+
+    # Errors of all the predictions, stacked along a new leading axis. The differences
+    # are written straight into one buffer, which is then reused for the absolute errors
+    diff = np.empty(
+        (len(predictions),) + np.shape(target),
+        dtype=np.result_type(target, *predictions.values()),
+    )
+    for i, prediction in enumerate(predictions.values()):
+        np.subtract(prediction, target, out=diff[i])
+    squared_error = np.multiply(diff, diff)
+    abs_error = np.abs(diff, out=diff)
+
+    metrics = {}
+    for i, tag in enumerate(predictions):
+        metrics.update(
+            _all_metrics(
+                abs_error[i],
+                squared_error[i],
+                hour_of_day,
+                month_of_year,
+                horizon_minutes,
+                thresholds,
+                hour_split_membership=hour_split_membership,
+                year_split_membership=year_split_membership,
+                tag=f"{tag}/",
             )
         )
-        if isinstance(thresholds, list):
-            for thresh in thresholds:
-                day_metrics.update(
-                    count_large_errors(
-                        predictions=day_predictions, target=day_target, threshold=thresh
-                    )
-                )
-        elif thresholds >= 0:
-            day_metrics.update(
-                count_large_errors(
-                    predictions=day_predictions, target=day_target, threshold=thresholds
+
+        # Filter by night and run again, by masking the already computed values
+        if filter_by_night:
+            metrics.update(
+                _all_metrics(
+                    abs_error[i][day_mask],
+                    squared_error[i][day_mask],
+                    day_hour_of_day,
+                    day_month_of_year,
+                    day_horizon_minutes,
+                    thresholds,
+                    hour_split_membership=hour_split_membership,
+                    year_split_membership=year_split_membership,
+                    tag=f"{tag}/no_night/",
                 )
             )
-        for key in list(day_metrics.keys()):
-            day_metrics["no_night/" + key] = day_metrics.pop(key)
-        metrics.update(day_metrics)
-
-    for key in list(metrics.keys()):
-        metrics[tag + "/" + key] = metrics.pop(key)
 
     return metrics
+
+
+def compute_metrics(
+    predictions: np.ndarray,
+    target: np.ndarray,
+    datetimes: np.ndarray,
+    start_time: np.ndarray,
+    filter_by_night: bool = False,
+    tag: str = "",
+    thresholds: Union[list, float] = -1,
+    hour_of_day: Optional[np.ndarray] = None,
+    month_of_year: Optional[np.ndarray] = None,
+    day_mask: Optional[np.ndarray] = None,
+    hour_split: Optional[dict[str, tuple[int, ...]]] = None,
+    year_split: Optional[dict[str, tuple[int, ...]]] = None,
+    latitude: Optional[Union[float, np.ndarray]] = None,
+    longitude: Optional[Union[float, np.ndarray]] = None,
+    sun_position_for_night: float = -5,
+    **kwargs,
+) -> dict:
+    """
+    Convenience function to compute all metrics.
+
+    Args:
+        predictions: Prediction array.
+        target: Target array.
+        datetimes: Datetimes for the array.
+        start_time: Array where predictions begin from,
+            where the forecast time horizon is measured from.
+        tag: Tag to use for overall (i.e. train/val/test).
+        filter_by_night: Filter by night time as well and return metrics for only daytime,
+            requires latitude, longitude, and sun_position_for_night, unless day_mask is given.
+        thresholds: Thresholds for computing large errors (i.e. what defines large)
+            can be list of thresholds, or a single one. None are calculated by default.
+        hour_of_day: Hour of each datetime, if already known, so repeated calls on the
+            same datetimes don't extract it again. If None it is extracted from datetimes.
+        month_of_year: Month of each datetime, if already known. If None it is
+            extracted from datetimes.
+        day_mask: Boolean array which is True for non-nighttime samples, if already known,
+            i.e. from get_day_mask. If None and filter_by_night is set, it is computed from
+            latitude, longitude, and sun_position_for_night.
+        hour_split: Hour split. If None then a sensible default will be used.
+        year_split: How to split the year. If None then a sensible default will be used.
+        latitude: Latitude of the site(s), for the night filter.
+        longitude: Longitude of the site(s), for the night filter.
+        sun_position_for_night: Sun elevation in degrees below which it is 'night'.
+        kwargs: Not used.
+
+    Returns:
+        Dictionary of metrics
+    """
+    return compute_metrics_batch(
+        predictions={tag: predictions},
+        target=target,
+        datetimes=datetimes,
+        start_time=start_time,
+        filter_by_night=filter_by_night,
+        thresholds=thresholds,
+        hour_of_day=hour_of_day,
+        month_of_year=month_of_year,
+        day_mask=day_mask,
+        hour_split=hour_split,
+        year_split=year_split,
+        latitude=latitude,
+        longitude=longitude,
+        sun_position_for_night=sun_position_for_night,
+    )
@@ -1,10 +1,214 @@
 """Utility functions"""
-from typing import Tuple
+import hashlib
+import os
+import warnings
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Callable, Tuple
 
 import numpy as np
+import pandas as pd
 import pvlib
 
 
+def _solar_position_method() -> str:
+    """
+    Get the pvlib solar position method to use for the night time checks
+
+    This can be set with the OCF_ML_METRICS_SPA_METHOD environment variable, otherwise the
+    numba compiled SPA is used if numba is installed, falling back to the numpy SPA. The
+    numba SPA only takes a single location, see _solar_position_location
+
+    Returns:
+        The name of the pvlib.solarposition.get_solarposition method
+    """
+    method = os.environ.get("OCF_ML_METRICS_SPA_METHOD")
+    if method:
+        return method
+    return "nrel_numba" if find_spec("numba") is not None else "nrel_numpy"
+
+
+def _solar_position_location(
+    latitude: np.ndarray, longitude: np.ndarray, method: str
+) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Locations and solar position method which pvlib can compute together
+
+    pvlib's numba SPA packs the location into a single float64 array, so it only takes a
+    scalar location. Constant locations are passed as scalars, and any other array of
+    locations falls back to the numpy SPA
+
+    Args:
+        latitude: float64 latitudes
+        longitude: float64 longitudes
+        method: pvlib solar position method
+
+    Returns:
+        The latitudes, longitudes and method to pass to pvlib
+    """
+    if method != "nrel_numba" or (latitude.ndim == 0 and longitude.ndim == 0):
+        return latitude, longitude, method
+    if (
+        latitude.size > 0
+        and longitude.size > 0
+        and (latitude == latitude.flat[0]).all()
+        and (longitude == longitude.flat[0]).all()
+    ):
+        return latitude.flat[0], longitude.flat[0], method
+    return latitude, longitude, "nrel_numpy"
+
+
+# Most recent solar elevations and day masks, keyed on a digest of their inputs, so the
+# caches only hold the results and not copies of the datetimes and locations
+_CACHE_SIZE = 16
+_solar_elevation_cache: "OrderedDict[Tuple[bytes, str], np.ndarray]" = OrderedDict()
+_day_mask_cache: "OrderedDict[Tuple[bytes, float, str], np.ndarray]" = OrderedDict()
+
+
+def clear_day_mask_cache() -> None:
+    """
+    Clear the cached solar elevations and day masks of get_day_mask
+
+    get_day_mask keeps the results for the 16 most recent datetimes and locations, which
+    for long inputs can be a lot of memory, so clear them once they are no longer needed
+    """
+    _solar_elevation_cache.clear()
+    _day_mask_cache.clear()
+
+
+def _cached(cache: OrderedDict, key: tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+    """
+    Get a result from a least recently used cache, computing and adding it if missing
+
+    Args:
+        cache: The cache, from key to result
+        key: Hashable key of the result
+        compute: Function which computes the result
+
+    Returns:
+        Read-only result, the same array for every cache hit
+    """
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    result = compute()
+    # The same array is returned for every cache hit, so make sure it can't be changed
+    result.setflags(write=False)
+    cache[key] = result
+    if len(cache) > _CACHE_SIZE:
+        cache.popitem(last=False)
+    return result
+
+
+def _inputs_digest(datetimes: np.ndarray, latitude: np.ndarray, longitude: np.ndarray) -> bytes:
+    """
+    Digest of the datetimes and locations, to key the caches on
+
+    Args:
+        datetimes: Contiguous UTC datetime64[ns] datetimes
+        latitude: Contiguous float64 latitudes
+        longitude: Contiguous float64 longitudes
+
+    Returns:
+        Digest of the values and shapes of the inputs
+    """
+    digest = hashlib.blake2b()
+    for values in (datetimes, latitude, longitude):
+        digest.update(repr(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.digest()
+
+
+def _solar_elevation(
+    datetimes: np.ndarray, latitude: np.ndarray, longitude: np.ndarray, key: bytes, method: str
+) -> np.ndarray:
+    """
+    Solar elevation of the datetimes and locations, cached on their digest
+
+    Args:
+        datetimes: Contiguous UTC datetime64[ns] datetimes
+        latitude: Contiguous float64 latitudes
+        longitude: Contiguous float64 longitudes
+        key: Digest of the datetimes and locations, from _inputs_digest
+        method: pvlib solar position method
+
+    Returns:
+        Read-only array of the solar elevation in degrees
+    """
+
+    def compute() -> np.ndarray:
+        solar_latitude, solar_longitude, solar_method = _solar_position_location(
+            latitude, longitude, method
+        )
+        with warnings.catch_warnings():
+            # pvlib reloads its SPA module to switch between numba and numpy, and warns
+            # every time, but the switch is chosen here rather than by the user
+            warnings.filterwarnings("ignore", message="Reloading spa to use", category=UserWarning)
+            solpos = pvlib.solarposition.get_solarposition(
+                time=datetimes,
+                latitude=solar_latitude,
+                longitude=solar_longitude,
+                # Which `method` to use?
+                # pyephem seemed to be a good mix between speed and ease but causes
+                # segfaults!
+                # nrel_numba is much faster, but doesn't work when using multiple worker
+                # processes, so set OCF_ML_METRICS_SPA_METHOD=nrel_numpy in that case.
+                # nrel_c is probably fastest but requires C code to be manually compiled:
+                # https://midcdmz.nrel.gov/spa/
+                method=solar_method,
+            )
+        return solpos["elevation"].to_numpy()
+
+    return _cached(_solar_elevation_cache, (key, method), compute)
+
+
+def get_day_mask(
+    datetimes: np.ndarray,
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    sun_position_for_night: float,
+) -> np.ndarray:
+    """
+    Get a boolean mask which is True for all non-nighttime datetimes
+
+    Night time is defined by the sun position below the horizon for the
+    location given. The solar position calculation is by far the slowest part, so the
+    masks for the most recent datetimes and locations are cached and reused. The solar
+    elevation is cached separately, so different night thresholds share it. Use
+    clear_day_mask_cache to free the cached results
+
+    Args:
+        datetimes: Datetimes for each target time
+        latitude: Latitude of the site for predictions
+        longitude: Longitude of site for predictions
+        sun_position_for_night: Elevation at which it is considered 'night'
+
+    Returns:
+        Read-only boolean array, True where the sun is above sun_position_for_night
+
+    """
+    # Naive datetimes are treated as UTC, and timezone aware ones converted to UTC. Anything
+    # but a datetime64 array, like timezone aware Timestamps, goes through pandas, as numpy's
+    # own conversion of timezone aware objects is deprecated
+    if not (isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == "M"):
+        datetimes = pd.DatetimeIndex(datetimes)
+        if datetimes.tz is not None:
+            datetimes = datetimes.tz_convert("UTC").tz_localize(None)
+        datetimes = datetimes.to_numpy()
+    datetimes = np.ascontiguousarray(datetimes, dtype="datetime64[ns]")
+    latitude = np.ascontiguousarray(latitude, dtype=np.float64)
+    longitude = np.ascontiguousarray(longitude, dtype=np.float64)
+    key = _inputs_digest(datetimes, latitude, longitude)
+    method = _solar_position_method()
+    sun_position_for_night = float(sun_position_for_night)
+
+    def compute() -> np.ndarray:
+        elevation = _solar_elevation(datetimes, latitude, longitude, key, method)
+        return elevation > sun_position_for_night
+
+    return _cached(_day_mask_cache, (key, sun_position_for_night, method), compute)
+
+
 def filter_night(
     predictions: np.ndarray,
     target: np.ndarray,
@@ -31,19 +235,12 @@ def filter_night(
         The predictions, targets, and datetimes for all non-nighttime predictions
 
     """
-    solpos = pvlib.solarposition.get_solarposition(
-        time=datetimes,
+    day_mask = get_day_mask(
+        datetimes=datetimes,
         latitude=latitude,
         longitude=longitude,
-        # Which `method` to use?
-        # pyephem seemed to be a good mix between speed and ease but causes
-        # segfaults!
-        # nrel_numba doesn't work when using multiple worker processes.
-        # nrel_c is probably fastest but requires C code to be manually compiled:
-        # https://midcdmz.nrel.gov/spa/
+        sun_position_for_night=sun_position_for_night,
     )
-    elevation_mask = solpos["elevation"] <= sun_position_for_night
-    predictions = predictions[~elevation_mask]
-    target = target[~elevation_mask]
-    datetimes = datetimes[~elevation_mask]
-    return predictions, target, datetimes
+    if not isinstance(datetimes, (np.ndarray, pd.DatetimeIndex)):
+        datetimes = np.asarray(datetimes)
+    return predictions[day_mask], target[day_mask], datetimes[day_mask]
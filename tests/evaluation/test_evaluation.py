@@ -5,8 +5,8 @@ from tests.consts_for_tests import N_METRICS
 
 
 def test_evaluation():
-    t0 = pd.date_range(start="2022-01-01 00:00", end="2022-01-01 4:00", freq="1H")
-    target_dt = pd.date_range(start="2022-01-01 5:00", end="2022-01-01 9:00", freq="1H")
+    t0 = pd.date_range(start="2022-01-01 00:00", end="2022-01-01 4:00", freq="h")
+    target_dt = pd.date_range(start="2022-01-01 5:00", end="2022-01-01 9:00", freq="h")
     ids = [1, 1, 1, 2, 2]
     lat = [55.3781, 55.3781, 55.3781, 20.0, 20.0]
     longs = [0.0, 0.0, 0.0, 60.0, 60.0]
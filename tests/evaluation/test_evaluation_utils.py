@@ -0,0 +1,16 @@
+import pandas as pd
+import pytest
+
+from ocf_ml_metrics.evaluation.utils import check_results_df
+
+
+def test_check_results_df_missing_columns():
+    results_df = pd.DataFrame(
+        {
+            "t0_datetime_utc": pd.date_range(start="2022-01-01 00:00", periods=2, freq="h"),
+            "target_datetime_utc": pd.date_range(start="2022-01-01 01:00", periods=2, freq="h"),
+            "id": [1, 1],
+        }
+    )
+    with pytest.raises(AssertionError, match="capacity_mwp"):
+        check_results_df(results_df, unit="mw")
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    # Arrays are shared between tests, so make sure no test can change them
+    array.flags.writeable = False
+    return array
+
+
+def _random_pair(n_samples: int):
+    rng = np.random.default_rng(0)
+    return _read_only(rng.random((n_samples, 1))), _read_only(rng.random((n_samples, 1)))
+
+
+@pytest.fixture(scope="session")
+def monthly_year_datetimes():
+    return _read_only(
+        pd.date_range(start="2022-01-01 00:00", end="2022-12-31 00:00", freq="ME").to_numpy()
+    )
+
+
+@pytest.fixture(scope="session")
+def hourly_day_datetimes():
+    return _read_only(
+        pd.date_range(start="2022-01-01 00:00", end="2022-01-01 23:00", freq="h").to_numpy()
+    )
+
+
+@pytest.fixture(scope="session")
+def hourly_year_datetimes():
+    return _read_only(
+        pd.date_range(start="2022-01-01 00:00", end="2022-12-31 23:00", freq="h").to_numpy()
+    )
+
+
+@pytest.fixture(scope="session")
+def hourly_year_start_time(hourly_year_datetimes):
+    return _read_only(hourly_year_datetimes - pd.Timedelta("5min"))
+
+
+@pytest.fixture(scope="session")
+def seasonal_weeks_datetimes():
+    # One week per season populates every split, at 1/13 of the size of a full year
+    return _read_only(
+        np.concatenate(
+            [
+                pd.date_range(
+                    start=f"2022-{month:02d}-01 00:00", periods=7 * 24, freq="h"
+                ).to_numpy()
+                for month in (1, 4, 7, 10)
+            ]
+        )
+    )
+
+
+@pytest.fixture(scope="session")
+def seasonal_weeks_start_time(seasonal_weeks_datetimes):
+    return _read_only(seasonal_weeks_datetimes - pd.Timedelta("5min"))
+
+
+@pytest.fixture(scope="session")
+def day_5min_datetimes():
+    # 289 5 minutely datetimes over the 1st of June, including the end midnight
+    return _read_only(
+        np.arange(
+            np.datetime64("2022-06-01T00:00"),
+            np.datetime64("2022-06-02T00:05"),
+            np.timedelta64(5, "m"),
+        )
+    )
+
+
+@pytest.fixture(scope="session")
+def random_pair_year(hourly_year_datetimes):
+    return _random_pair(len(hourly_year_datetimes))
+
+
+@pytest.fixture(scope="session")
+def random_pair_weeks(seasonal_weeks_datetimes):
+    return _random_pair(len(seasonal_weeks_datetimes))
+
+
+@pytest.fixture(scope="session")
+def random_pair_day(day_5min_datetimes):
+    return _random_pair(len(day_5min_datetimes))
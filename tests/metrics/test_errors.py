@@ -1,27 +1,59 @@
+import warnings
+from collections import Counter
+
 import numpy as np
 import pandas as pd
+import pytest
 
 from ocf_ml_metrics.metrics.errors import (
     common_metrics,
     compute_metrics,
+    compute_metrics_batch,
     compute_metrics_part_of_day,
     compute_metrics_part_of_year,
+    compute_metrics_time_horizons,
+    count_large_errors,
 )
 from tests.consts_for_tests import N_METRICS
 
+_SEASON_TAGS = frozenset({"Winter", "Summer", "Fall", "Spring"})
+_PART_OF_DAY_TAGS = frozenset({"Morning", "Afternoon", "Evening", "Night"})
+_SPLIT_TAGS = _SEASON_TAGS | _PART_OF_DAY_TAGS
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
 
-def test_common_error_metrics_1d_input():
-    predictions = np.random.random(8)
-    target = np.random.random(8)
+@pytest.fixture(scope="module", params=["weeks", pytest.param("year", marks=pytest.mark.slow)])
+def compute_metrics_inputs(request):
+    # Datetimes, start times, predictions and target for the compute_metrics tests
+    prefix = "hourly_year" if request.param == "year" else "seasonal_weeks"
+    return (
+        request.getfixturevalue(f"{prefix}_datetimes"),
+        request.getfixturevalue(f"{prefix}_start_time"),
+        *request.getfixturevalue(f"random_pair_{request.param}"),
+    )
+
+
+def test_common_error_metrics_1d_input(rng):
+    predictions = rng.random(8)
+    target = rng.random(8)
     errors = common_metrics(predictions=predictions, target=target)
     for key in ["mae", "rmse"]:
         assert key in errors.keys()
         assert isinstance(errors[key], float)
 
 
-def test_common_error_metrics_2d_input():
-    predictions = np.random.random((8, 16))
-    target = np.random.random((8, 16))
+def test_common_error_metrics_0d_input():
+    errors = common_metrics(predictions=np.float64(1.0), target=np.float64(0.5))
+    assert errors == {"mae": 0.5, "rmse": 0.5}
+
+
+def test_common_error_metrics_2d_input(rng):
+    predictions = rng.random((8, 16))
+    target = rng.random((8, 16))
     errors = common_metrics(predictions=predictions, target=target)
     for key in ["mae", "rmse"]:
         assert key in errors.keys()
@@ -30,7 +62,18 @@ def test_common_error_metrics_2d_input():
         assert errors[key].dtype == np.float64
 
 
-def test_compute_error_part_of_year():
+@pytest.mark.parametrize("shape", [(8,), (8, 16)])
+def test_common_error_metrics_float32_input(rng, shape):
+    predictions = rng.random(shape).astype(np.float32)
+    target = rng.random(shape).astype(np.float32)
+    errors = common_metrics(predictions=predictions, target=target)
+    float64_errors = common_metrics(predictions=predictions.astype(np.float64), target=target)
+    for key in ["mae", "rmse"]:
+        assert errors[key].dtype == np.float32
+        np.testing.assert_allclose(errors[key], float64_errors[key], rtol=1e-6)
+
+
+def test_compute_error_part_of_year(monthly_year_datetimes):
     predictions = np.zeros((12, 1))
 
     # Set up different errors for different seasons, so we can check that the
@@ -41,41 +84,194 @@ def test_compute_error_part_of_year():
     target[[5, 6, 7]] = 3  # Summer
     target[[8, 9, 10]] = 4  # Fall
 
-    datetimes = np.asarray(
-        pd.date_range(start="2022-01-01 00:00", end="2022-12-31 00:00", freq="1M")
-    )
+    datetimes = monthly_year_datetimes
     assert len(datetimes) == 12
     errors = compute_metrics_part_of_year(
         predictions=predictions, target=target, datetimes=datetimes
     )
-    for key in errors.keys():
-        assert "Winter" in key or "Summer" in key or "Fall" in key or "Spring" in key
+    # Keys are "{split}/{metric}", so the split is a single set lookup
+    assert {key.split("/", 1)[0] for key in errors} == _SEASON_TAGS
 
     expected_errors = {"Winter/mae": 1, "Spring/mae": 2, "Summer/mae": 3, "Fall/mae": 4}
     for key, err in expected_errors.items():
         np.testing.assert_almost_equal(errors[key], err, err_msg=f"{key} is incorrect!")
 
 
-def test_compute_error_part_of_day():
-    predictions = np.random.random((24, 1))
-    target = np.random.random((24, 1))
-    datetimes = np.asarray(
-        pd.date_range(start="2022-01-01 00:00", end="2022-01-01 23:00", freq="1H")
+def test_compute_error_part_of_day(hourly_day_datetimes, rng):
+    predictions = rng.random((24, 1))
+    target = rng.random((24, 1))
+    datetimes = hourly_day_datetimes
+    errors = compute_metrics_part_of_day(
+        predictions=predictions, target=target, datetimes=datetimes
+    )
+    assert {key.split("/", 1)[0] for key in errors} == _PART_OF_DAY_TAGS
+
+
+def test_compute_error_part_of_day_precomputed_hours(hourly_day_datetimes, rng):
+    predictions = rng.random((24, 1))
+    target = rng.random((24, 1))
+    datetimes = hourly_day_datetimes
+    errors = compute_metrics_part_of_day(
+        predictions=predictions, target=target, datetimes=datetimes
+    )
+    precomputed_errors = compute_metrics_part_of_day(
+        predictions=predictions,
+        target=target,
+        datetimes=datetimes,
+        hour_of_day=pd.DatetimeIndex(datetimes).hour.to_numpy(),
     )
+    assert errors.keys() == precomputed_errors.keys()
+    for key in errors:
+        np.testing.assert_almost_equal(errors[key], precomputed_errors[key])
+
+
+def test_compute_error_part_of_day_nat():
+    datetimes = pd.date_range(start="2022-01-01 00:00", end="2022-01-01 05:00", freq="h").to_numpy()
+    datetimes[1] = np.datetime64("NaT")
+    predictions = np.zeros(len(datetimes))
+    target = np.arange(len(datetimes), dtype=float)
     errors = compute_metrics_part_of_day(
         predictions=predictions, target=target, datetimes=datetimes
     )
-    for key in errors.keys():
-        assert "Night" in key or "Morning" in key or "Afternoon" in key or "Evening" in key
+    # The NaT sample is dropped, rather than counted in the Evening
+    assert {key.split("/", 1)[0] for key in errors} == {"Night", "Morning"}
+    np.testing.assert_almost_equal(errors["Night/mae"], 5 / 3)
+    np.testing.assert_almost_equal(errors["Morning/mae"], 4.5)
 
+    year_errors = compute_metrics_part_of_year(
+        predictions=predictions, target=target, datetimes=datetimes
+    )
+    assert {key.split("/", 1)[0] for key in year_errors} == {"Winter"}
+    np.testing.assert_almost_equal(year_errors["Winter/mae"], 14 / 5)
 
-def test_compute_metrics():
-    datetimes = np.asarray(
-        pd.date_range(start="2022-01-01 00:00", end="2022-12-31 23:00", freq="1H")
+    # pandas gives float hours with NaN for NaT, from a DatetimeIndex or .dt.hour
+    index_errors = compute_metrics_part_of_day(
+        predictions=predictions, target=target, datetimes=pd.DatetimeIndex(datetimes)
+    )
+    series_hours = pd.Series(datetimes).dt.hour.to_numpy()
+    assert series_hours.dtype == np.float64
+    series_errors = compute_metrics_part_of_day(
+        predictions=predictions, target=target, datetimes=datetimes, hour_of_day=series_hours
     )
-    predictions = np.random.random((len(datetimes), 1))
-    target = np.random.random((len(datetimes), 1))
-    start_time = datetimes - pd.Timedelta("5min")
+    assert index_errors == errors
+    assert series_errors == errors
+
+
+def test_compute_metrics_time_horizons_nat():
+    datetimes = pd.date_range(start="2022-01-01 01:00", end="2022-01-01 04:00", freq="h").to_numpy()
+    start_time = datetimes - pd.Timedelta("30min")
+    datetimes[1] = np.datetime64("NaT")
+    start_time[2] = np.datetime64("NaT")
+    predictions = np.zeros(len(datetimes))
+    target = np.asarray([1.0, 3.0, 2.0, 4.0])
+    errors = compute_metrics_time_horizons(
+        predictions=predictions, target=target, datetimes=datetimes, start_time=start_time
+    )
+    # The samples with a NaT datetime or start time are dropped
+    assert errors.keys() == {"forecast_horizon_30_minutes/mae", "forecast_horizon_30_minutes/rmse"}
+    np.testing.assert_almost_equal(errors["forecast_horizon_30_minutes/mae"], 2.5)
+
+
+def test_compute_error_part_of_day_overlapping_split(rng):
+    predictions = rng.random((48, 2))
+    target = rng.random((48, 2))
+    datetimes = pd.date_range(start="2022-01-01 00:00", end="2022-01-02 23:00", freq="h").to_numpy()
+    hour_split = {"Early": (0, 1, 2, 3), "Overlap": (3, 4), "Empty": (), "Late": (23,)}
+    errors = compute_metrics_part_of_day(
+        predictions=predictions, target=target, datetimes=datetimes, hour_split=hour_split
+    )
+    assert "Empty/mae" not in errors
+    hours = pd.DatetimeIndex(datetimes).hour.to_numpy()
+    for name in ["Early", "Overlap", "Late"]:
+        mask = np.isin(hours, hour_split[name])
+        np.testing.assert_almost_equal(
+            errors[f"{name}/mae"], np.abs(predictions[mask] - target[mask]).mean(axis=0)
+        )
+        np.testing.assert_almost_equal(
+            errors[f"{name}/rmse"],
+            np.sqrt(np.square(predictions[mask] - target[mask]).mean(axis=0)),
+        )
+
+
+def test_compute_metrics_time_horizons():
+    datetimes = pd.date_range(start="2022-01-01 01:00", end="2022-01-01 04:00", freq="h").to_numpy()
+    start_time = np.asarray(
+        pd.to_datetime(
+            ["2022-01-01 00:30", "2022-01-01 01:00", "2022-01-01 02:30", "2022-01-01 03:00"]
+        )
+    )
+    predictions = np.zeros(4)
+    target = np.asarray([1.0, 3.0, 2.0, 4.0])
+    errors = compute_metrics_time_horizons(
+        predictions=predictions, target=target, datetimes=datetimes, start_time=start_time
+    )
+    assert len(errors) == 2 * N_METRICS
+    np.testing.assert_almost_equal(errors["forecast_horizon_30_minutes/mae"], 1.5)
+    np.testing.assert_almost_equal(errors["forecast_horizon_60_minutes/mae"], 3.5)
+    np.testing.assert_almost_equal(errors["forecast_horizon_60_minutes/rmse"], np.sqrt(12.5))
+
+    # DatetimeIndex inputs give the same horizons
+    index_errors = compute_metrics_time_horizons(
+        predictions=predictions,
+        target=target,
+        datetimes=pd.DatetimeIndex(datetimes),
+        start_time=start_time,
+    )
+    assert index_errors == errors
+
+    # Object arrays of timezone aware Timestamps, as Series.to_numpy() gives, are subtracted
+    # in one vectorized pandas operation, without a PerformanceWarning
+    def tz_aware_objects(values):
+        return pd.Series(pd.DatetimeIndex(values).tz_localize("UTC")).to_numpy()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        tz_aware_errors = compute_metrics_time_horizons(
+            predictions=predictions,
+            target=target,
+            datetimes=tz_aware_objects(datetimes),
+            start_time=tz_aware_objects(start_time),
+        )
+    assert tz_aware_errors == errors
+
+
+def test_count_large_errors_multiple_thresholds():
+    predictions = np.zeros((5, 1))
+    target = np.asarray([[0.5], [1.5], [2.5], [3.5], [4.5]])
+    errors = count_large_errors(predictions=predictions, target=target, threshold=[1, 3])
+    assert errors == {"large_error_count_threshold_1": 4, "large_error_count_threshold_3": 2}
+    errors = count_large_errors(predictions=predictions, target=target, threshold=2)
+    assert errors == {"large_error_count_threshold_2": 3}
+
+
+def test_compute_metrics_all_night(rng):
+    datetimes = pd.date_range(start="2022-01-01 00:00", end="2022-01-01 03:00", freq="h").to_numpy()
+    predictions = rng.random((len(datetimes), 1))
+    target = rng.random((len(datetimes), 1))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        errors = compute_metrics(
+            predictions=predictions,
+            target=target,
+            datetimes=datetimes,
+            filter_by_night=True,
+            day_mask=np.zeros(len(datetimes), dtype=bool),
+            start_time=datetimes - pd.Timedelta("5min"),
+        )
+    no_night_keys = [key for key in errors if "no_night" in key]
+    assert sorted(no_night_keys) == ["/no_night/mae", "/no_night/rmse"]
+    for key in no_night_keys:
+        assert errors[key].shape == (1,)
+        assert np.isnan(errors[key]).all()
+
+
+@pytest.mark.parametrize(
+    "thresholds,n_keys",
+    # Thresholds in MW, each adds a large error count to both the night and no_night keys
+    [(-1, 10 * N_METRICS), ([1000, 2000], 11 * N_METRICS)],
+)
+def test_compute_metrics(compute_metrics_inputs, thresholds, n_keys):
+    datetimes, start_time, predictions, target = compute_metrics_inputs
     errors = compute_metrics(
         predictions=predictions,
         target=target,
@@ -85,48 +281,37 @@ def test_compute_metrics():
         longitude=0.0,
         sun_position_for_night=-5,
         start_time=start_time,
+        thresholds=thresholds,
     )
-    assert len([key for key in errors if "no_night" in key]) == 33 * N_METRICS
-    assert len([key for key in errors if "no_night" not in key]) == 10 * N_METRICS
-    assert (
-        len([key for key in errors if "Winter" in key]) == 2 * N_METRICS
-    )  # night/no_night and 2 metrics each
-    assert len([key for key in errors if "Summer" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Fall" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Spring" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Morning" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Afternoon" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Evening" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Night" in key]) == 2 * N_METRICS
-
-
-def test_compute_metrics_threshold():
-    datetimes = np.asarray(
-        pd.date_range(start="2022-01-01 00:00", end="2022-12-31 23:00", freq="1H")
-    )
-    predictions = np.random.random((len(datetimes), 1))
-    target = np.random.random((len(datetimes), 1))
-    start_time = datetimes - pd.Timedelta("5min")
-    errors = compute_metrics(
-        predictions=predictions,
+    # Count the keys containing each tag in a single pass
+    counts = Counter(tag for key in errors for tag in _SPLIT_TAGS | {"no_night"} if tag in key)
+    assert counts["no_night"] == n_keys
+    assert len(errors) - counts["no_night"] == n_keys
+    for tag in _SPLIT_TAGS:
+        assert counts[tag] == 2 * N_METRICS, tag  # night/no_night and 2 metrics each
+
+
+def test_compute_metrics_batch_matches_compute_metrics(rng):
+    datetimes = pd.date_range(start="2022-06-01 00:00", end="2022-06-02 00:00", freq="h").to_numpy()
+    predictions = rng.random(len(datetimes))
+    baseline = np.zeros_like(predictions)
+    target = rng.random(len(datetimes))
+    start_time = datetimes - pd.Timedelta("30min")
+    kwargs = dict(
         target=target,
         datetimes=datetimes,
+        start_time=start_time,
         filter_by_night=True,
         latitude=55.3781,
         longitude=0.0,
         sun_position_for_night=-5,
-        start_time=start_time,
-        thresholds=[1000, 2000],  # MW
-    )
-    assert len([key for key in errors if "no_night" in key]) == 34 * N_METRICS
-    assert len([key for key in errors if "no_night" not in key]) == 11 * N_METRICS
-    assert (
-        len([key for key in errors if "Winter" in key]) == 2 * N_METRICS
-    )  # night/no_night and 2 metrics each
-    assert len([key for key in errors if "Summer" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Fall" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Spring" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Morning" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Afternoon" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Evening" in key]) == 2 * N_METRICS
-    assert len([key for key in errors if "Night" in key]) == 2 * N_METRICS
+        thresholds=[0.5],
+    )
+    batch_errors = compute_metrics_batch(
+        predictions={"model": predictions, "baseline": baseline}, **kwargs
+    )
+    errors = compute_metrics(predictions=predictions, tag="model", **kwargs)
+    errors.update(compute_metrics(predictions=baseline, tag="baseline", **kwargs))
+    assert batch_errors.keys() == errors.keys()
+    for key in errors:
+        np.testing.assert_almost_equal(batch_errors[key], errors[key])
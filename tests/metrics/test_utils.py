@@ -1,17 +1,24 @@
+import warnings
+
 import numpy as np
 import pandas as pd
+import pytest
 
-from ocf_ml_metrics.metrics.utils import filter_night
+from ocf_ml_metrics.metrics.utils import (
+    _solar_elevation_cache,
+    clear_day_mask_cache,
+    filter_night,
+    get_day_mask,
+)
 
 
-def test_filter_night_sun_0_degrees():
-    predictions = np.random.random((289, 1))  # 1 day at 5 minutely intervals
-    target = np.random.random((289, 1))
+def test_filter_night_sun_0_degrees(random_pair_day):
+    predictions, target = random_pair_day  # 1 day at 5 minutely intervals
     latitude = 55.3781  # Center of UK according to Google
     longitude = 3.4360
-    datetimes = np.asarray(
-        pd.date_range(start="2022-01-01 00:00", end="2022-01-02 00:00", freq="5min")
-    )
+    datetimes = np.arange(
+        np.datetime64("2022-01-01T00:00"), np.datetime64("2022-01-02T00:05"), np.timedelta64(5, "m")
+    )  # 289 5 minutely datetimes, including the end midnight
     filtered_predictions, filtered_target, filtered_datetimes = filter_night(
         predictions=predictions,
         target=target,
@@ -27,14 +34,13 @@ def test_filter_night_sun_0_degrees():
     assert len(filtered_datetimes) < len(datetimes)
 
 
-def test_filter_night_sun_multi_degrees():
-    predictions = np.random.random((289, 1))  # 1 day at 5 minutely intervals
-    target = np.random.random((289, 1))
+def test_filter_night_sun_multi_degrees(random_pair_day, day_5min_datetimes):
+    predictions, target = random_pair_day  # 1 day at 5 minutely intervals
     latitude = 55.3781  # Center of UK according to Google
     longitude = 3.4360
-    datetimes = np.asarray(
-        pd.date_range(start="2022-06-01 00:00", end="2022-06-02 00:00", freq="5min")
-    )
+    datetimes = day_5min_datetimes
+    # The solar elevation is computed once, and shared by all the thresholds
+    clear_day_mask_cache()
     filtered_predictions, filtered_target, filtered_datetimes = filter_night(
         predictions=predictions,
         target=target,
@@ -74,3 +80,84 @@ def test_filter_night_sun_multi_degrees():
     assert len(filtered_predictions3) < len(filtered_predictions2)
     assert len(filtered_target3) < len(filtered_target2)
     assert len(filtered_datetimes3) < len(filtered_datetimes2)
+    assert len(_solar_elevation_cache) == 1
+
+
+def test_get_day_mask(day_5min_datetimes):
+    latitude = 55.3781  # Center of UK according to Google
+    longitude = 3.4360
+    datetimes = day_5min_datetimes
+    day_mask = get_day_mask(
+        datetimes=datetimes,
+        latitude=latitude,
+        longitude=longitude,
+        sun_position_for_night=0,
+    )
+    assert day_mask.dtype == bool
+    assert day_mask.shape == datetimes.shape
+    assert not day_mask[0]  # Midnight
+    assert day_mask[144]  # Midday
+
+
+def test_get_day_mask_spa_method(monkeypatch, day_5min_datetimes):
+    datetimes = day_5min_datetimes
+    kwargs = dict(datetimes=datetimes, latitude=55.3781, longitude=3.4360, sun_position_for_night=0)
+    default_day_mask = get_day_mask(**kwargs)
+
+    monkeypatch.setenv("OCF_ML_METRICS_SPA_METHOD", "nrel_numpy")
+    np.testing.assert_array_equal(get_day_mask(**kwargs), default_day_mask)
+
+    monkeypatch.setenv("OCF_ML_METRICS_SPA_METHOD", "not_a_method")
+    with pytest.raises(ValueError):
+        get_day_mask(**kwargs)
+
+
+def test_get_day_mask_timezone_aware(day_5min_datetimes):
+    datetimes = pd.DatetimeIndex(day_5min_datetimes).tz_localize("UTC").tz_convert("Europe/Paris")
+    kwargs = dict(latitude=55.3781, longitude=3.4360, sun_position_for_night=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        # An object array of timezone aware Timestamps, like Series.to_numpy() gives
+        day_mask = get_day_mask(datetimes=pd.Series(datetimes).to_numpy(), **kwargs)
+    np.testing.assert_array_equal(day_mask, get_day_mask(datetimes=day_5min_datetimes, **kwargs))
+
+
+def test_get_day_mask_numba_array_locations(monkeypatch, day_5min_datetimes):
+    pytest.importorskip("numba")
+    datetimes = np.concatenate([day_5min_datetimes, day_5min_datetimes])
+    n_datetimes = len(day_5min_datetimes)
+    for latitude, longitude in [
+        (np.repeat([55.3781, 20.0], n_datetimes), np.repeat([3.4360, 60.0], n_datetimes)),
+        (np.full(len(datetimes), 55.3781), np.full(len(datetimes), 3.4360)),
+    ]:
+        kwargs = dict(
+            datetimes=datetimes, latitude=latitude, longitude=longitude, sun_position_for_night=0
+        )
+        monkeypatch.setenv("OCF_ML_METRICS_SPA_METHOD", "nrel_numpy")
+        numpy_day_mask = get_day_mask(**kwargs)
+        monkeypatch.setenv("OCF_ML_METRICS_SPA_METHOD", "nrel_numba")
+        np.testing.assert_array_equal(get_day_mask(**kwargs), numpy_day_mask)
+
+
+def test_get_day_mask_cached():
+    datetimes = pd.date_range(start="2022-06-01 00:00", end="2022-06-02 00:00", freq="5min")
+    day_mask = get_day_mask(
+        datetimes=datetimes, latitude=55.3781, longitude=3.4360, sun_position_for_night=0
+    )
+    # Same values as a different type, so should hit the cache
+    day_mask_again = get_day_mask(
+        datetimes=np.asarray(datetimes),
+        latitude=55.3781,
+        longitude=3.4360,
+        sun_position_for_night=0,
+    )
+    assert day_mask_again is day_mask
+    assert not day_mask.flags.writeable
+
+    # Cleared caches recompute the same mask
+    clear_day_mask_cache()
+    day_mask_cleared = get_day_mask(
+        datetimes=datetimes, latitude=55.3781, longitude=3.4360, sun_position_for_night=0
+    )
+    assert day_mask_cleared is not day_mask
+    np.testing.assert_array_equal(day_mask_cleared, day_mask)